@@ -3,37 +3,73 @@
 파일 복사 도구
 source와 중복된 frame 번호를 가진 train의 png 파일들을 output 디렉토리로 복사하는 도구
 """
+import re
 import sys
 import os
 import shutil
-import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# 이름들을 이어붙인 버퍼를 한 번에 스캔할 때 쓰는 패턴 (각 줄 = 파일명 하나)
+_FRAME_RE = re.compile(r'^frame_(\d+)', re.MULTILINE)
+
 def extract_frame_number(filename):
     """파일명에서 frame 번호 추출"""
     # source: frame_000004_png.rf.bc57731e2806e1eb3e0b4d66077b3627.jpg -> 000004
     # train: frame_003754.png -> 003754
-    match = re.search(r'frame_(\d+)', filename)
-    if match:
-        return match.group(1)
-    return None
+    # 파일명이 항상 frame_NNNN... 형식이므로 regex 없이 문자열 파싱으로 처리 (파일당 호출되는 핫패스)
+    if not filename.startswith('frame_'):
+        return None
+    i = 6
+    j = i
+    n = len(filename)
+    while j < n and filename[j].isdigit():
+        j += 1
+    return filename[i:j] if j > i else None
+
+def copy_file_fast(src, dst):
+    """파일 하나를 복사 (가능하면 커널 내부 복사 사용)"""
+    # Linux의 copy_file_range는 유저스페이스 버퍼 없이 커널 안에서 복사하고,
+    # reflink를 지원하는 FS(Btrfs/XFS)에서는 사실상 O(1)
+    if hasattr(os, 'copy_file_range'):
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                src_fd = fsrc.fileno()
+                dst_fd = fdst.fileno()
+                remaining = os.fstat(src_fd).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(src_fd, dst_fd, remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            shutil.copystat(src, dst)
+            return
+        except OSError:
+            # 일부 커널/FS 조합에서는 미지원 — 일반 복사로 폴백
+            pass
+    shutil.copy2(src, dst)
 
 def get_source_frame_numbers(source_dir):
     """source 디렉토리에서 모든 frame 번호들을 가져오기"""
-    source_path = Path(source_dir)
     source_frames = set()
-    
-    if source_path.exists():
-        for file in source_path.iterdir():
-            if file.is_file():
-                frame_num = extract_frame_number(file.name)
-                if frame_num:
-                    source_frames.add(frame_num)
-    
+
+    if os.path.isdir(source_dir):
+        with os.scandir(source_dir) as it:
+            names = [e.name for e in it if e.is_file(follow_symlinks=False)]
+        if names:
+            # 파일명에는 개행이 올 수 없으므로 '\n'으로 이어붙인 버퍼를
+            # finditer 한 번으로 스캔 — 이름당 파이썬 레벨 호출이 전부 사라지고
+            # 정규식 엔진이 C에서 버퍼 전체를 처리함
+            blob = "\n".join(names)
+            source_frames = {m.group(1) for m in _FRAME_RE.finditer(blob)}
+
     return source_frames
 
-def copy_overlapping_train_files(source_dir, train_dir, output_dir):
-    """source와 중복된 frame 번호를 가진 train 파일들을 output으로 복사"""
+def copy_overlapping_train_files(source_dir, train_dir, output_dir, verbose=False):
+    """source와 중복된 frame 번호를 가진 train 파일들을 output으로 복사
+
+    verbose=False이면 파일별 로그 대신 1024개마다 진행 상황만 출력
+    """
     train_path = Path(train_dir)
     output_path = Path(output_dir)
     
@@ -58,39 +94,40 @@ def copy_overlapping_train_files(source_dir, train_dir, output_dir):
         print("⚠️ Source 디렉토리에 frame 파일이 없습니다.")
         return
     
-    # train 디렉토리에서 중복된 frame 번호를 가진 파일들 찾기
-    train_files = list(train_path.iterdir())
+    # train 디렉토리를 scandir 한 번으로 훑으면서 중복 판정까지 바로 수행 —
+    # 중간 목록/매핑 없이 엔트리당 집합 조회 한 번이면 충분함
+    total_train_files = 0
     overlapping_files = []
-    
-    print(f"Train 디렉토리의 총 파일 개수: {len([f for f in train_files if f.is_file()])}")
+    # 무중복 진단용 train frame 번호는 10개까지만 수집 (메모리 상한)
+    debug_train_frames = set()
+    with os.scandir(train_dir) as it:
+        for entry in it:
+            if entry.is_file(follow_symlinks=False):
+                total_train_files += 1
+                frame_num = extract_frame_number(entry.name)
+                if frame_num:
+                    if frame_num in source_frames:
+                        overlapping_files.append(entry)
+                        if verbose:
+                            print(f"🎯 중복 발견: {entry.name} (frame_{frame_num})")
+                    elif len(debug_train_frames) < 10:
+                        debug_train_frames.add(frame_num)
+
+    print(f"Train 디렉토리의 총 파일 개수: {total_train_files}")
     print()
-    
-    for file in train_files:
-        if file.is_file():
-            frame_num = extract_frame_number(file.name)
-            if frame_num and frame_num in source_frames:
-                overlapping_files.append(file)
-                print(f"🎯 중복 발견: {file.name} (frame_{frame_num})")
-    
+
     if not overlapping_files:
         print("⚠️ Source와 Train에 공통된 frame 번호가 없습니다.")
         print()
         print("📋 Source의 frame 번호들 (처음 10개):")
         for i, frame in enumerate(sorted(source_frames)[:10]):
             print(f"  {i+1}. frame_{frame}")
-        
+
         print()
-        print("📋 Train의 frame 번호들 (처음 10개):")
-        train_frames = set()
-        for file in train_files:
-            if file.is_file():
-                frame_num = extract_frame_number(file.name)
-                if frame_num:
-                    train_frames.add(frame_num)
-        
-        for i, frame in enumerate(sorted(train_frames)[:10]):
+        print("📋 Train의 frame 번호들 (최대 10개):")
+        for i, frame in enumerate(sorted(debug_train_frames)):
             print(f"  {i+1}. frame_{frame}")
-        
+
         return
     
     print()
@@ -99,20 +136,70 @@ def copy_overlapping_train_files(source_dir, train_dir, output_dir):
     
     # 파일들 복사
     copied_count = 0
-    
-    for file in overlapping_files:
-        output_file = output_path / file.name
-        
+
+    # 파일당 print는 콘솔 flush 비용이 파일 작업보다 비쌀 수 있으므로
+    # 메시지를 모아 256개 단위로 한 번에 출력
+    messages = []
+
+    def log(msg):
+        messages.append(msg + "\n")
+        if len(messages) >= 256:
+            sys.stdout.write(''.join(messages))
+            messages.clear()
+
+    # os.path.join도 호출마다 파싱 비용이 있으므로 출력 경로 접두어를 미리 만들어 둠
+    dst_prefix = os.fspath(output_path) + os.sep
+
+    def copy_one(entry):
+        """파일 하나 복사 (스레드에서 실행) — (이름, 예외 또는 None) 반환"""
+        dst = dst_prefix + entry.name
         try:
-            # 같은 이름의 파일이 있으면 덮어쓰기
-            if output_file.exists():
-                print(f"⚠️ 기존 파일 덮어쓰기: {output_file}")
-            
-            shutil.copy2(str(file), str(output_file))
-            print(f"✓ 복사됨: {file.name}")
-            copied_count += 1
+            # output은 작업용 사본이므로 같은 FS면 하드링크로 대체 —
+            # 데이터 블록 복사 없이 메타데이터 작업만으로 끝남
+            try:
+                os.link(entry.path, dst)
+                return entry.name, None
+            except FileExistsError:
+                # 이미 같은 inode(이전 실행의 하드링크)면 할 일이 없음 —
+                # inode는 scandir 결과에 캐시되어 있어 stat 한 번이면 판별됨
+                try:
+                    dst_stat = os.stat(dst)
+                    if (dst_stat.st_ino == entry.inode()
+                            and dst_stat.st_dev == entry.stat().st_dev):
+                        return entry.name, None
+                except OSError:
+                    pass
+                # 기존 파일 덮어쓰기 의미 유지: 지우고 다시 링크
+                os.unlink(dst)
+                try:
+                    os.link(entry.path, dst)
+                    return entry.name, None
+                except OSError:
+                    pass
+            except OSError:
+                # 다른 볼륨/FS 미지원/권한 문제 → 일반 복사로 폴백
+                pass
+            copy_file_fast(entry.path, dst)
+            return entry.name, None
         except Exception as e:
-            print(f"❌ 복사 실패: {file.name} - {e}")
+            return entry.name, e
+
+    # 복사 I/O는 GIL을 놓으므로 스레드 풀로 병렬 복사
+    # (같은 이름의 기존 파일은 이전과 동일하게 덮어씀)
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for i, (name, error) in enumerate(executor.map(copy_one, overlapping_files)):
+            # 대용량 작업에서는 출력 포맷팅 자체가 병목이므로 기본은 주기적 진행 상황만
+            if error is None:
+                copied_count += 1
+                if verbose or (i & 1023) == 0:
+                    log(f"✓ 복사됨: {name}")
+            else:
+                log(f"❌ 복사 실패: {name} - {error}")
+
+    if messages:
+        sys.stdout.write(''.join(messages))
+        messages.clear()
     
     print()
     print("-" * 50)
@@ -3,16 +3,22 @@
 파일 이동 도구
 디렉토리1에서 N번째마다 있는 파일을 디렉토리2로 이동하는 도구
 """
+import errno
+import operator
 import sys
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # 설정 변수
 MOVE_INTERVAL = 5  # 2개 중 1개 이동 (원하는 간격으로 변경 가능)
 
-def move_every_nth_file(source_dir, target_dir, interval=MOVE_INTERVAL):
-    """디렉토리1에서 N번째마다 있는 파일을 디렉토리2로 이동"""
+def move_every_nth_file(source_dir, target_dir, interval=MOVE_INTERVAL, verbose=False):
+    """디렉토리1에서 N번째마다 있는 파일을 디렉토리2로 이동
+
+    verbose=False이면 파일별 로그 대신 1024개마다 진행 상황만 출력
+    """
     source_path = Path(source_dir)
     target_path = Path(target_dir)
     
@@ -30,7 +36,12 @@ def move_every_nth_file(source_dir, target_dir, interval=MOVE_INTERVAL):
     target_path.mkdir(parents=True, exist_ok=True)
     
     # 파일 목록을 정렬된 순서로 가져오기
-    source_files = sorted([f for f in source_path.iterdir() if f.is_file()])
+    # os.scandir는 readdir에서 파일 타입을 캐시하므로 엔트리마다 stat을 다시 안 함
+    with os.scandir(source_dir) as it:
+        source_files = [e for e in it if e.is_file(follow_symlinks=False)]
+    # attrgetter는 C 호출이라 람다처럼 엔트리마다 파이썬 프레임을 만들지 않음
+    # (N번째 선택이 결정적이어야 하므로 정렬 자체는 유지)
+    source_files.sort(key=operator.attrgetter('name'))
     print(f"원본 디렉토리 파일 개수: {len(source_files)}")
     
     if len(source_files) == 0:
@@ -41,23 +52,91 @@ def move_every_nth_file(source_dir, target_dir, interval=MOVE_INTERVAL):
     
     # N번째마다 파일 선택 (interval에 따라)
     moved_count = 0
-    
+    target_dir_str = os.fspath(target_path)
+    target_prefix = target_dir_str + os.sep
+
+    # 장치 비교는 루프 밖에서 한 번만: 같은 볼륨이면 rename 한 번으로 끝나고,
+    # 다른 볼륨이면 처음부터 shutil.move(복사+삭제)로 감
+    try:
+        same_device = os.stat(source_dir).st_dev == os.stat(target_dir_str).st_dev
+    except OSError:
+        same_device = True  # 판별 실패 시 rename을 시도하고 EXDEV에서 폴백
+
+    # POSIX에서는 디렉토리 fd 기준 rename(renameat)을 사용해 이동마다
+    # 커널이 부모 경로 전체를 다시 해석하지 않게 함 (Windows는 경로 문자열 사용)
+    src_dir_fd = dst_dir_fd = None
+    if same_device and os.rename in os.supports_dir_fd:
+        try:
+            src_dir_fd = os.open(source_dir, os.O_RDONLY)
+            dst_dir_fd = os.open(target_dir_str, os.O_RDONLY)
+        except OSError:
+            if src_dir_fd is not None:
+                os.close(src_dir_fd)
+            src_dir_fd = dst_dir_fd = None
+
+    # 파일당 print는 콘솔 flush 비용이 파일 작업보다 비쌀 수 있으므로
+    # 메시지를 모아 256개 단위로 한 번에 출력
+    messages = []
+
+    def log(msg):
+        messages.append(msg + "\n")
+        if len(messages) >= 256:
+            sys.stdout.write(''.join(messages))
+            messages.clear()
+
+    # N번째 파일 선별 (유지 파일 로그는 여기서 처리)
+    selected_files = []
     for i, source_file in enumerate(source_files):
         if (i + 1) % interval == 0:  # N번째마다
-            target_file = target_path / source_file.name
-            
+            selected_files.append(source_file)
+        elif verbose:
+            log(f"⚪ 유지됨: {source_file.name}")
+
+    def move_one(entry):
+        """파일 하나 이동 (스레드에서 실행) — (이름, 예외 또는 None) 반환"""
+        name = entry.name
+        try:
             try:
-                # 같은 이름의 파일이 있으면 덮어쓰기
-                if target_file.exists():
-                    print(f"⚠️ 기존 파일 덮어쓰기: {target_file}")
-                
-                shutil.move(str(source_file), str(target_file))
-                print(f"✓ 이동됨: {source_file.name} -> {target_file}")
-                moved_count += 1
-            except Exception as e:
-                print(f"❌ 이동 실패: {source_file.name} - {e}")
-        else:
-            print(f"⚪ 유지됨: {source_file.name}")
+                if src_dir_fd is not None:
+                    # renameat: 파일명만 넘기고 부모 경로 해석은 fd가 대신함
+                    os.rename(name, name,
+                              src_dir_fd=src_dir_fd, dst_dir_fd=dst_dir_fd)
+                elif same_device:
+                    # 같은 볼륨이면 rename 한 번이면 충분. os.replace는
+                    # 원자적으로 덮어쓰므로 exists() 사전 확인도 필요 없음
+                    os.replace(entry.path, target_prefix + name)
+                else:
+                    shutil.move(entry.path, target_prefix + name)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                # 장치 판별이 어긋난 경우(바인드 마운트 등) 복사+삭제 폴백
+                shutil.move(entry.path, target_prefix + name)
+            return name, None
+        except Exception as e:
+            return name, e
+
+    # rename/move는 시스템콜 동안 GIL을 놓으므로 스레드 풀로 병렬 이동
+    # (결과 소비와 로그 출력은 메인 스레드에서)
+    try:
+        if selected_files:
+            max_workers = min(32, (os.cpu_count() or 1) * 4)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for i, (name, error) in enumerate(executor.map(move_one, selected_files)):
+                    if error is None:
+                        moved_count += 1
+                        if verbose or (i & 1023) == 0:
+                            log(f"✓ 이동됨: {name} -> {target_prefix + name}")
+                    else:
+                        log(f"❌ 이동 실패: {name} - {error}")
+    finally:
+        if src_dir_fd is not None:
+            os.close(src_dir_fd)
+            os.close(dst_dir_fd)
+
+    if messages:
+        sys.stdout.write(''.join(messages))
+        messages.clear()
     
     print()
     print("-" * 50)
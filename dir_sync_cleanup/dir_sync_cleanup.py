@@ -3,12 +3,31 @@
 디렉토리 동기화 삭제 도구
 디렉토리1에 없는 파일이 디렉토리2에 있으면 삭제하는 일회성 동기화 도구
 """
+import itertools
 import sys
 import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
-def sync_delete_files(source_dir, target_dir):
-    """디렉토리1에 없는 파일들을 디렉토리2에서 삭제"""
+try:
+    import xxhash  # C 구현 비암호화 해시
+except ImportError:
+    xxhash = None
+
+if xxhash is not None:
+    # 파일명 비교는 동등성만 필요하므로 이름을 uint64 해시로 보관 —
+    # int 집합은 문자열 집합보다 엔트리당 메모리가 수 배 작고 재해싱도 없음
+    # (64비트 해시 충돌 확률은 이 용도에선 무시 가능)
+    name_key = xxhash.xxh64_intdigest
+else:
+    def name_key(name):
+        return name
+
+def sync_delete_files(source_dir, target_dir, verbose=False):
+    """디렉토리1에 없는 파일들을 디렉토리2에서 삭제
+
+    verbose=True이면 삭제된 파일을 개별 출력 (기본은 요약만)
+    """
     source_path = Path(source_dir)
     target_path = Path(target_dir)
     
@@ -17,43 +36,93 @@ def sync_delete_files(source_dir, target_dir):
     print("-" * 50)
     
     # 디렉토리1의 파일 목록 (파일명만)
-    source_files = set()
-    if source_path.exists():
-        source_files = {f.name for f in source_path.iterdir() if f.is_file()}
-        print(f"기준 디렉토리 파일 개수: {len(source_files)}")
-    else:
+    # os.scandir는 readdir에서 파일 타입이 캐시되어 엔트리마다 stat을 안 함
+    if not source_path.exists():
         print(f"⚠️ 기준 디렉토리가 없습니다: {source_path}")
         return
-    
+
+    with os.scandir(source_dir) as it:
+        source_files = {name_key(e.name)
+                        for e in it if e.is_file(follow_symlinks=False)}
+    print(f"기준 디렉토리 파일 개수: {len(source_files)}")
+
     # 디렉토리2의 파일 목록
     if not target_path.exists():
         print(f"⚠️ 정리 대상 디렉토리가 없습니다: {target_path}")
         return
-    
-    target_files = [f for f in target_path.iterdir() if f.is_file()]
-    print(f"정리 대상 디렉토리 파일 개수: {len(target_files)}")
-    print()
-    
-    # 디렉토리1에 없는 파일들을 디렉토리2에서 찾아 삭제
+
+    # POSIX에서는 대상 디렉토리 fd 기준 unlinkat을 사용해 삭제마다
+    # 커널이 부모 경로 전체를 다시 해석하지 않게 함 (Windows는 경로 문자열 사용)
+    target_dir_fd = None
+    if os.unlink in os.supports_dir_fd:
+        try:
+            target_dir_fd = os.open(target_dir, os.O_RDONLY)
+        except OSError:
+            target_dir_fd = None
+
+    # 디렉토리1에 없는 파일들을 디렉토리2에서 삭제
+    # unlink는 시스템콜 동안 GIL을 놓으므로 스레드 풀로 병렬 삭제
+    def delete_one(entry):
+        try:
+            if target_dir_fd is not None:
+                os.unlink(entry.name, dir_fd=target_dir_fd)
+            else:
+                os.unlink(entry.path)
+            return entry.path, None
+        except OSError as e:
+            return entry.path, e
+
     deleted_count = 0
-    
-    for target_file in target_files:
-        filename = target_file.name
-        
-        if filename not in source_files:
-            try:
-                target_file.unlink()
-                print(f"✓ 삭제됨: {target_file}")
-                deleted_count += 1
-            except Exception as e:
-                print(f"❌ 삭제 실패: {target_file} - {e}")
+    kept_count = 0
+    failed_count = 0
+
+    def consume(future):
+        nonlocal deleted_count, failed_count
+        path, error = future.result()
+        if error is None:
+            deleted_count += 1
+            if verbose:
+                print(f"✓ 삭제됨: {path}")
         else:
-            print(f"⚪ 유지됨: {target_file}")
-    
+            failed_count += 1
+            print(f"❌ 삭제 실패: {path} - {error}")
+
+    # 대상 디렉토리를 스캔하면서 바로 삭제를 제출 — 전체 목록을 메모리에
+    # 올리지 않고(수백만 파일에서도 상주 메모리 일정), 첫 삭제까지의 지연도 짧음
+    # in-flight future 수는 max_workers*2로 제한
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+    try:
+        with os.scandir(target_dir) as it, \
+                ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+            def candidates():
+                nonlocal kept_count
+                for entry in it:
+                    if entry.is_file(follow_symlinks=False):
+                        if name_key(entry.name) not in source_files:
+                            yield entry
+                        else:
+                            kept_count += 1
+
+            gen = candidates()
+            pending = {executor.submit(delete_one, entry)
+                       for entry in itertools.islice(gen, max_workers * 2)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    consume(future)
+                for entry in itertools.islice(gen, len(done)):
+                    pending.add(executor.submit(delete_one, entry))
+    finally:
+        if target_dir_fd is not None:
+            os.close(target_dir_fd)
+
     print()
     print("-" * 50)
     print(f"🗑️ 총 {deleted_count}개 파일이 삭제되었습니다.")
-    print(f"📁 {len(target_files) - deleted_count}개 파일이 유지되었습니다.")
+    print(f"📁 {kept_count}개 파일이 유지되었습니다.")
+    if failed_count:
+        print(f"❌ {failed_count}개 파일 삭제에 실패했습니다.")
 
 if __name__ == "__main__":
     # 하드코딩된 디렉토리 경로
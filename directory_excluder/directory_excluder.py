@@ -3,40 +3,98 @@
 디렉토리 파일 제외 도구
 디렉토리1에서 디렉토리2에 있는 파일들을 제외(삭제 또는 이동)하는 도구
 """
+import errno
 import sys
 import os
 import shutil
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+try:
+    import xxhash  # SIMD C 구현 비암호화 해시 — dedup 용도로 SHA보다 수십 배 빠름
+except ImportError:
+    xxhash = None
+
+def hash_file_contents(path):
+    """dedup 비교용 파일 내용 해시를 계산"""
+    h = xxhash.xxh3_64() if xxhash is not None else hashlib.blake2b(digest_size=8)
+    with open(path, 'rb') as f:
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+    return h.hexdigest()
+
 def get_files_by_comparison_mode(directory, mode):
-    """비교 모드에 따라 파일 정보를 가져옴"""
-    path = Path(directory)
+    """비교 모드에 따라 파일 정보를 가져옴 (name/size 모드 전용 —
+    content 모드는 크기 선별을 거치는 2단계 경로를 사용)"""
     files_info = {}
-    
-    if not path.exists():
+
+    if not os.path.isdir(directory):
         return files_info
-    
-    for file in path.iterdir():
-        if file.is_file():
-            if mode == "name":
-                # 파일명으로 비교
-                files_info[file.name] = file
-            elif mode == "size":
-                # 파일명 + 크기로 비교
-                key = f"{file.name}_{file.stat().st_size}"
-                files_info[key] = file
-            elif mode == "content":
-                # 파일 내용 해시로 비교 (간단히 크기로 대체)
-                key = f"{file.stat().st_size}_{file.name}"
-                files_info[key] = file
-    
+
+    # os.scandir는 readdir 결과에 파일 타입/크기가 캐시되어 있어
+    # 항목마다 별도의 stat 호출이 필요 없음 (특히 Windows에서 빠름)
+    # 값은 DirEntry 그대로 저장 — .name/.path로 충분하고 Path 생성 비용이 없음
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file(follow_symlinks=False):
+                if mode == "name":
+                    # 파일명으로 비교
+                    files_info[entry.name] = entry
+                elif mode == "size":
+                    # 파일명 + 크기로 비교 (entry.stat()은 DirEntry에 캐시됨)
+                    key = f"{entry.name}_{entry.stat().st_size}"
+                    files_info[key] = entry
+
     return files_info
 
-def exclude_files_from_directory(source_dir, exclude_dir, output_dir=None, 
-                                action="delete", comparison_mode="name", dry_run=False):
+def _keys_only(directory, mode):
+    """비교 키 집합만 생성 (제외 기준 디렉토리용 — 엔트리 참조를 보관하지 않음)"""
+    keys = set()
+
+    if not os.path.isdir(directory):
+        return keys
+
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file(follow_symlinks=False):
+                if mode == "name":
+                    keys.add(entry.name)
+                elif mode == "size":
+                    keys.add(f"{entry.name}_{entry.stat().st_size}")
+
+    return keys
+
+def _scan_sizes(directory):
+    """content 모드 1단계: (엔트리, 크기)만 수집 — 파일 내용은 읽지 않음"""
+    entries = []
+
+    if not os.path.isdir(directory):
+        return entries
+
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file(follow_symlinks=False):
+                entries.append((entry, entry.stat().st_size))
+
+    return entries
+
+def _content_keys_only(entries, shared_sizes):
+    """content 모드 2단계: 상대편에 같은 크기가 있는 파일만 해시한 키 집합"""
+    return {f"{size}_{hash_file_contents(entry.path)}"
+            for entry, size in entries if size in shared_sizes}
+
+def _content_files_info(entries, shared_sizes):
+    """content 모드 2단계: 상대편에 같은 크기가 있는 파일만 해시한 키→엔트리 dict"""
+    return {f"{size}_{hash_file_contents(entry.path)}": entry
+            for entry, size in entries if size in shared_sizes}
+
+def exclude_files_from_directory(source_dir, exclude_dir, output_dir=None,
+                                action="delete", comparison_mode="name", dry_run=False,
+                                verbose=False):
     """
     디렉토리1에서 디렉토리2에 있는 파일들을 제외
-    
+
     Args:
         source_dir: 기준 디렉토리 (파일을 제외할 디렉토리)
         exclude_dir: 제외할 파일들이 있는 디렉토리
@@ -44,6 +102,7 @@ def exclude_files_from_directory(source_dir, exclude_dir, output_dir=None,
         action: "delete" 또는 "move"
         comparison_mode: "name", "size", "content" 중 하나
         dry_run: True이면 실제 작업하지 않고 미리보기만
+        verbose: True이면 파일마다 로그 출력, False이면 1024개마다 진행 상황만 출력
     """
     source_path = Path(source_dir)
     exclude_path = Path(exclude_dir)
@@ -66,25 +125,58 @@ def exclude_files_from_directory(source_dir, exclude_dir, output_dir=None,
         print(f"⚠️ 제외 기준 디렉토리가 없습니다: {exclude_path}")
         return 0
     
-    # 제외할 파일들의 정보 가져오기
-    exclude_files = get_files_by_comparison_mode(exclude_dir, comparison_mode)
-    print(f"제외 기준 파일 개수: {len(exclude_files)}")
-    
-    # 기준 디렉토리의 파일들 확인
-    source_files = get_files_by_comparison_mode(source_dir, comparison_mode)
-    print(f"기준 디렉토리 파일 개수: {len(source_files)}")
+    # 두 디렉토리 스캔은 서로 독립적인 메타데이터 I/O라 동시에 수행
+    # (시스템콜 동안 GIL이 풀리므로 네트워크 FS에서는 거의 절반으로 단축)
+    if comparison_mode == "content":
+        # rdfind/fdupes식 2단계 비교: 크기만 먼저 수집해 교집합을 구하고,
+        # 상대편에 같은 크기가 있는 파일만 해시 — 크기가 안 겹치는 파일은
+        # 내용을 한 바이트도 읽지 않음
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            future_exclude = executor.submit(_scan_sizes, exclude_dir)
+            future_source = executor.submit(_scan_sizes, source_dir)
+            exclude_entries = future_exclude.result()
+            source_entries = future_source.result()
+
+        exclude_count = len(exclude_entries)
+        source_count = len(source_entries)
+
+        shared_sizes = ({size for _, size in source_entries}
+                        & {size for _, size in exclude_entries})
+
+        # 해시 계산(파일 읽기)도 디렉토리별로 병렬
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            future_exclude = executor.submit(_content_keys_only,
+                                             exclude_entries, shared_sizes)
+            future_source = executor.submit(_content_files_info,
+                                            source_entries, shared_sizes)
+            exclude_keys = future_exclude.result()
+            source_files = future_source.result()
+    else:
+        # 제외 기준 쪽은 키 집합만 있으면 되므로 엔트리를 들고 있지 않는 가벼운 스캔 사용
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            future_exclude = executor.submit(_keys_only, exclude_dir, comparison_mode)
+            future_source = executor.submit(get_files_by_comparison_mode,
+                                            source_dir, comparison_mode)
+            exclude_keys = future_exclude.result()
+            source_files = future_source.result()
+
+        exclude_count = len(exclude_keys)
+        source_count = len(source_files)
+
+    print(f"제외 기준 파일 개수: {exclude_count}")
+    print(f"기준 디렉토리 파일 개수: {source_count}")
     print()
     
-    if not exclude_files:
+    if not exclude_count:
         print("⚠️ 제외할 파일이 없습니다.")
         return 0
     
     # 제외할 파일들 찾기
-    files_to_exclude = []
-    for key, source_file in source_files.items():
-        if key in exclude_files:
-            files_to_exclude.append((key, source_file, exclude_files[key]))
-    
+    # dict 뷰의 & 연산은 C로 구현된 집합 교집합이라 키마다 파이썬 레벨로
+    # 해싱/조회하는 루프보다 훨씬 빠름
+    common_keys = source_files.keys() & exclude_keys
+    files_to_exclude = [(key, source_files[key]) for key in common_keys]
+
     if not files_to_exclude:
         print("⚠️ 제외할 파일이 발견되지 않았습니다.")
         print(f"📋 비교 모드 '{comparison_mode}'로 일치하는 파일이 없습니다.")
@@ -98,39 +190,85 @@ def exclude_files_from_directory(source_dir, exclude_dir, output_dir=None,
         output_path = Path(output_dir)
         if not dry_run:
             output_path.mkdir(parents=True, exist_ok=True)
+        # 루프 안에서 Path 생성/파싱을 반복하지 않도록 문자열로 미리 변환
+        out_dir = os.fspath(output_path)
+        sep = os.sep
+        # 출력 디렉토리의 기존 파일명을 메모리 집합으로 한 번만 읽어 두면
+        # 충돌 확인이 파일당 시스템콜 0번 — 같은 stem이 많아도 O(1) 조회
+        existing = set()
+        if not dry_run:
+            with os.scandir(out_dir) as it:
+                existing = {e.name for e in it}
     
     # 파일 처리
     processed_count = 0
     failed_count = 0
-    
-    for i, (key, source_file, exclude_file) in enumerate(files_to_exclude, 1):
+
+    # 파일당 print는 콘솔 flush 비용이 파일 작업보다 비쌀 수 있으므로
+    # 메시지를 모아 256개 단위로 한 번에 출력
+    messages = []
+
+    def log(msg):
+        messages.append(msg + "\n")
+        if len(messages) >= 256:
+            sys.stdout.write(''.join(messages))
+            messages.clear()
+
+    for i, (key, source_file) in enumerate(files_to_exclude, 1):
+        # 대용량 작업에서는 출력 포맷팅 자체가 병목이므로 기본은 주기적 진행 상황만
+        # (비트마스크가 % 1024보다 싼 fast-path)
+        report = verbose or (i & 1023) == 0
         try:
             if dry_run:
-                print(f"[미리보기 {i:3d}] {action}: {source_file.name}")
-                if comparison_mode != "name":
-                    print(f"              기준: {exclude_file}")
+                if report:
+                    log(f"[미리보기 {i:3d}] {action}: {source_file.name}")
+                    if comparison_mode != "name":
+                        log(f"              비교 키: {key}")
             else:
                 if action == "delete":
-                    source_file.unlink()
-                    print(f"✓ [{i:3d}] 삭제됨: {source_file.name}")
+                    os.unlink(source_file.path)
+                    if report:
+                        log(f"✓ [{i:3d}] 삭제됨: {source_file.name}")
                 elif action == "move" and output_dir:
-                    output_file = Path(output_dir) / source_file.name
-                    # 같은 이름 파일이 있으면 번호 추가
-                    counter = 1
-                    while output_file.exists():
-                        stem = source_file.stem
-                        suffix = source_file.suffix
-                        output_file = Path(output_dir) / f"{stem}_{counter}{suffix}"
-                        counter += 1
-                    
-                    shutil.move(str(source_file), str(output_file))
-                    print(f"✓ [{i:3d}] 이동됨: {source_file.name} → {output_file.name}")
-                
+                    name = source_file.name
+                    # 같은 이름 파일이 있으면 번호 추가 — 충돌 확인은 existing 집합으로만
+                    # (이전의 O_CREAT|O_EXCL 선점 루프는 파일당 시스템콜이 들어서 제거)
+                    if name not in existing:
+                        chosen = name
+                    else:
+                        # pathlib stem/suffix 대신 문자열 분리 (한 번만)
+                        stem, dot, ext = name.rpartition('.')
+                        if dot:
+                            ext = '.' + ext
+                        else:
+                            stem, ext = name, ''
+                        counter = 1
+                        while f"{stem}_{counter}{ext}" in existing:
+                            counter += 1
+                        chosen = f"{stem}_{counter}{ext}"
+                    existing.add(chosen)
+                    output_file = out_dir + sep + chosen
+
+                    try:
+                        # 같은 볼륨이면 rename 한 번이면 충분 (shutil.move의 stat/복사 폴백 생략)
+                        os.replace(source_file.path, output_file)
+                    except OSError as e:
+                        if e.errno != errno.EXDEV:
+                            raise
+                        # 다른 볼륨이면 복사+삭제 폴백
+                        shutil.move(source_file.path, output_file)
+                    if report:
+                        log(f"✓ [{i:3d}] 이동됨: {name} → {chosen}")
+
                 processed_count += 1
         except Exception as e:
-            print(f"❌ [{i:3d}] 실패: {source_file.name} - {e}")
+            log(f"❌ [{i:3d}] 실패: {source_file.name} - {e}")
             failed_count += 1
-    
+
+    if messages:
+        sys.stdout.write(''.join(messages))
+        messages.clear()
+
     print()
     print("-" * 60)
     if dry_run:
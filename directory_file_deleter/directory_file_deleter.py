@@ -7,8 +7,25 @@ import sys
 import os
 from pathlib import Path
 
-def delete_matching_files(directory1, directory2):
-    """디렉토리1에서 디렉토리2에 있는 같은 이름의 파일들을 삭제"""
+try:
+    import xxhash  # C 구현 비암호화 해시
+except ImportError:
+    xxhash = None
+
+if xxhash is not None:
+    # 파일명 비교는 동등성만 필요하므로 이름을 uint64 해시로 보관 —
+    # int 집합은 문자열 집합보다 엔트리당 메모리가 수 배 작고 재해싱도 없음
+    # (64비트 해시 충돌 확률은 이 용도에선 무시 가능)
+    name_key = xxhash.xxh64_intdigest
+else:
+    def name_key(name):
+        return name
+
+def delete_matching_files(directory1, directory2, verbose=False):
+    """디렉토리1에서 디렉토리2에 있는 같은 이름의 파일들을 삭제
+
+    verbose=False이면 파일별 로그 대신 1024개마다 진행 상황만 출력
+    """
     dir1_path = Path(directory1)
     dir2_path = Path(directory2)
     
@@ -26,13 +43,15 @@ def delete_matching_files(directory1, directory2):
         return
     
     # 디렉토리2의 파일 목록 (파일명만)
-    dir2_files = set()
-    if dir2_path.exists():
-        dir2_files = {f.name for f in dir2_path.iterdir() if f.is_file()}
-        print(f"디렉토리2의 파일 개수: {len(dir2_files)}")
-    
+    # os.scandir는 readdir에서 파일 타입이 캐시되어 엔트리마다 stat을 안 함
+    with os.scandir(directory2) as it:
+        dir2_files = {name_key(e.name)
+                      for e in it if e.is_file(follow_symlinks=False)}
+    print(f"디렉토리2의 파일 개수: {len(dir2_files)}")
+
     # 디렉토리1의 파일 목록
-    dir1_files = [f for f in dir1_path.iterdir() if f.is_file()]
+    with os.scandir(directory1) as it:
+        dir1_files = [e for e in it if e.is_file(follow_symlinks=False)]
     print(f"디렉토리1의 파일 개수: {len(dir1_files)}")
     print()
     
@@ -43,20 +62,51 @@ def delete_matching_files(directory1, directory2):
     # 디렉토리1에서 디렉토리2와 같은 이름의 파일들 찾아서 삭제
     deleted_count = 0
     skipped_count = 0
-    
+
+    # 파일당 print는 콘솔 flush 비용이 파일 작업보다 비쌀 수 있으므로
+    # 메시지를 모아 256개 단위로 한 번에 출력하고, 기본은 주기적 진행 상황만
+    messages = []
+
+    def log(msg):
+        messages.append(msg + "\n")
+        if len(messages) >= 256:
+            sys.stdout.write(''.join(messages))
+            messages.clear()
+
+    # POSIX에서는 디렉토리1 fd 기준 unlinkat을 사용해 삭제마다
+    # 커널이 부모 경로 전체를 다시 해석하지 않게 함 (Windows는 경로 문자열 사용)
+    dir1_fd = None
+    if os.unlink in os.supports_dir_fd:
+        try:
+            dir1_fd = os.open(directory1, os.O_RDONLY)
+        except OSError:
+            dir1_fd = None
+
     for file in dir1_files:
         filename = file.name
-        
-        if filename in dir2_files:
+
+        if name_key(filename) in dir2_files:
             try:
-                file.unlink()
-                print(f"✓ 삭제됨: {filename}")
+                if dir1_fd is not None:
+                    os.unlink(filename, dir_fd=dir1_fd)
+                else:
+                    os.unlink(file.path)
                 deleted_count += 1
+                if verbose or (deleted_count & 1023) == 0:
+                    log(f"✓ 삭제됨: {filename}")
             except Exception as e:
-                print(f"❌ 삭제 실패: {filename} - {e}")
+                log(f"❌ 삭제 실패: {filename} - {e}")
         else:
-            print(f"⚪ 유지됨: {filename}")
             skipped_count += 1
+            if verbose:
+                log(f"⚪ 유지됨: {filename}")
+
+    if dir1_fd is not None:
+        os.close(dir1_fd)
+
+    if messages:
+        sys.stdout.write(''.join(messages))
+        messages.clear()
     
     print()
     print("-" * 50)
@@ -3,57 +3,391 @@
 디렉토리 동기화 삭제 도구
 디렉토리1에서 파일을 삭제하면 디렉토리2에서도 같은 이름의 파일을 자동 삭제
 """
+import collections
+import logging
+import queue
 import sys
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
 from watchdog.events import FileSystemEventHandler
 
+try:
+    # 리눅스 전용 — inotify를 직접 읽으면 watchdog의 이벤트 객체 생성/디스패치
+    # 오버헤드 없이 이벤트당 시스템콜+해시 조회+unlink로 끝남
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+# 이벤트 스레드의 로그는 큐에 put만 하고, 전용 리스너 스레드가 콘솔로 내보냄 —
+# 느린 콘솔 쓰기(특히 Windows)가 watchdog 디스패치 스레드를 막지 않게 함
+_log_queue = queue.SimpleQueue()
+log = logging.getLogger("realtime_sync_deleter")
+log.setLevel(logging.INFO)
+log.addHandler(QueueHandler(_log_queue))
+QueueListener(_log_queue, logging.StreamHandler()).start()
+
+def _is_remote_filesystem(path):
+    """경로가 네트워크 파일시스템(SMB/NFS 등) 위에 있는지 판별"""
+    path = os.path.realpath(path)
+    if os.name == 'nt':
+        # 드라이브 루트가 DRIVE_REMOTE(4)이면 네트워크 드라이브
+        import ctypes
+        drive = os.path.splitdrive(path)[0] + os.sep
+        return ctypes.windll.kernel32.GetDriveTypeW(drive) == 4
+    try:
+        # 가장 긴 마운트 지점 접두어의 fstype으로 판별
+        remote_types = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'fuse.sshfs'}
+        best_len = -1
+        best_type = None
+        with open('/proc/mounts') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point, fstype = fields[1], fields[2]
+                # 경로 구성 요소 경계에서만 매칭 — 단순 startswith는
+                # /mnt/net이 /mnt/network-local까지 집어삼킴
+                if (path == mount_point
+                        or path.startswith(mount_point.rstrip(os.sep) + os.sep)) \
+                        and len(mount_point) > best_len:
+                    best_len = len(mount_point)
+                    best_type = fstype
+        return best_type in remote_types
+    except OSError:
+        return False
+
+def _make_observer(source_dir):
+    """감시 백엔드 선택 — 로컬은 네이티브(inotify/ReadDirectoryChangesW), 원격은 폴링
+
+    네트워크 마운트에서는 네이티브 알림이 누락되기 쉬우므로 긴 주기의
+    PollingObserver가 더 안정적이고 시스템콜도 훨씬 적음
+    (주기는 SYNC_POLL_INTERVAL 환경 변수, 기본 30초)
+    """
+    if _is_remote_filesystem(source_dir):
+        interval = int(os.environ.get('SYNC_POLL_INTERVAL', 30))
+        print(f"🌐 네트워크 파일시스템 감지 → {interval}초 주기 폴링 사용")
+        return PollingObserver(timeout=interval)
+    return Observer()
+
 class SyncDeleteHandler(FileSystemEventHandler):
-    def __init__(self, source_dir, target_dir):
+    def __init__(self, source_dir, target_dir, echo=None):
         self.source_dir = Path(source_dir)
         self.target_dir = Path(target_dir)
+        # 양방향 모드에서 반대 방향 핸들러와 공유하는 "방금 내가 지운 이름" 기록 —
+        # A→B 삭제가 B 감시에 다시 잡혀 A를 지우는 핑퐁을 차단 (단방향에서는 None)
+        self._echo = echo
+        # 대상 디렉토리의 파일명 → 경로 인덱스를 시작 시 한 번만 구축 —
+        # 이벤트마다 exists() stat 대신 O(1) 해시 조회로 판별
+        # (인덱스는 대상 디렉토리 감시 핸들러가 계속 갱신함)
+        # POSIX에서는 대상 디렉토리 fd 기준 unlinkat을 사용해 삭제마다
+        # 커널이 부모 경로 전체를 다시 해석하지 않게 함 (fd는 프로세스 수명 동안 유지)
+        self._tgt_fd = None
+        if os.unlink in os.supports_dir_fd:
+            try:
+                self._tgt_fd = os.open(os.fspath(target_dir),
+                                       os.O_RDONLY | os.O_DIRECTORY)
+            except OSError:
+                self._tgt_fd = None
+        # 경로는 bytes로 미리 인코딩해 보관 — os.unlink에 bytes를 넘기면
+        # 호출마다 유니코드→파일시스템 인코딩 변환을 건너뜀
+        # (dir_fd 모드에서는 파일명만 있으면 되므로 basename만 보관)
+        with os.scandir(target_dir) as it:
+            self._index = {e.name: self._path_value(e.path)
+                           for e in it if e.is_file(follow_symlinks=False)}
+        # 인덱스에 없을 때 경로를 만들 접두어 — Path 연산 대신 str 연결 한 번
+        self._target_prefix = os.path.join(os.fspath(self.target_dir), '')
+        self._target_prefix_b = os.fsencode(self._target_prefix)
+        # 확장자 화이트리스트 (SYNC_EXTS=".png,.jpg") — endswith에 튜플을
+        # 넘기면 C 레벨 호출 한 번으로 모든 후보를 검사함
+        exts = os.environ.get('SYNC_EXTS', '')
+        self._exts = tuple(e for e in exts.split(',') if e) or None
+        # 일부 백엔드는 같은 삭제를 중복 통지함(NTFS의 rename+delete,
+        # inotify의 MOVED_FROM+DELETE) — 최근 처리한 이름을 1초 TTL의
+        # 바운디드 LRU로 기억해 중복 이벤트를 시스템콜 전에 걸러냄
+        self._recent = collections.OrderedDict()
+        # 대량 삭제 폭주를 흡수하는 큐 — 이벤트 스레드는 put만 하고,
+        # 백그라운드 스레드가 50ms 디바운스로 모아서 한꺼번에 unlink
+        self._queue = queue.SimpleQueue()
+        # SYNC_DRY_RUN이 설정되면 unlink를 생략하고 이벤트 처리량만 측정 —
+        # 폴링 주기/스레드 수 튜닝을 실제 파일 삭제 없이 할 수 있음
+        self._dry_run = bool(os.environ.get('SYNC_DRY_RUN'))
+        self._event_count = 0
+        if self._dry_run:
+            print("🧪 SYNC_DRY_RUN: 실제 삭제 없이 이벤트 처리량만 측정합니다")
+            threading.Thread(target=self._report_rate, daemon=True).start()
+        # unlink는 시스템콜 동안 GIL을 놓으므로 배치를 풀로 병렬 처리
+        # (스레드 수는 SYNC_THREADS 환경 변수, 기본 8)
+        self._pool = ThreadPoolExecutor(
+            max_workers=int(os.environ.get('SYNC_THREADS', '8')))
+        threading.Thread(target=self._drain, daemon=True).start()
         print(f"모니터링: {self.source_dir}")
-        print(f"동기화 대상: {self.target_dir}")
-        
+        print(f"동기화 대상: {self.target_dir} (파일 {len(self._index)}개 인덱싱)")
+
     def on_deleted(self, event):
         if event.is_directory:
             return
-            
-        # 삭제된 파일명 추출
-        deleted_file = Path(event.src_path)
-        filename = deleted_file.name
-        
-        # 대상 디렉토리에서 같은 이름의 파일 삭제
-        target_file = self.target_dir / filename
-        
-        if target_file.exists():
-            try:
-                target_file.unlink()
-                print(f"✓ 동기화 삭제: {target_file}")
-            except Exception as e:
-                print(f"❌ 삭제 실패: {target_file} - {e}")
-        else:
-            print(f"⚠ 대상 파일 없음: {target_file}")
-
-def monitor_directory(source_dir, target_dir):
-    """디렉토리 모니터링 시작"""
-    event_handler = SyncDeleteHandler(source_dir, target_dir)
-    observer = Observer()
+        # rpartition은 C 호출 한 번 — Path(...).name은 물론 os.path.basename의
+        # 파이썬 레벨 분기보다도 쌈 (watchdog은 마지막 구분자로 os.sep을 사용)
+        self.handle_deleted_name(event.src_path.rpartition(os.sep)[2])
+
+    def handle_deleted_name(self, filename):
+        """기준 쪽에서 삭제된 파일명 처리 (watchdog/직접 inotify 공용 진입점)"""
+        # 동기화 대상이 아닌 확장자(.tmp, 편집기 잠금 파일 등)는 즉시 무시
+        if self._exts is not None and not filename.endswith(self._exts):
+            return
+
+        self._event_count += 1
+        now = time.monotonic()
+
+        # 반대 방향 핸들러가 방금 지운 파일의 메아리면 무시 (양방향 모드)
+        if self._echo is not None:
+            ts = self._echo.pop(filename, None)
+            if ts is not None and now - ts < 1.0:
+                return
+
+        # 최근 1초 안에 처리한 이름이면 중복 통지 — 바로 무시
+        last = self._recent.get(filename)
+        if last is not None and now - last < 1.0:
+            return
+        self._recent[filename] = now
+        if len(self._recent) > 4096:
+            self._recent.popitem(last=False)
+
+        # 인덱스에서 빼면서 바로 경로를 얻음 — 없으면 stat 한 번도 안 함
+        target_file = self._index.pop(filename, None)
+        if target_file is None:
+            # 인덱스가 뒤처졌을 수 있으므로 접두어+이름으로 경로를 만들어
+            # 일단 시도 — 정말 없으면 드레인의 FileNotFoundError에서 걸러짐
+            if self._tgt_fd is not None:
+                target_file = os.fsencode(filename)
+            else:
+                target_file = self._target_prefix_b + os.fsencode(filename)
+
+        # 실제 unlink는 배치 드레인 스레드에서 — 이벤트 스레드를 막지 않음
+        if self._echo is not None:
+            # 메아리 이벤트가 안 오는 경우(대상에 파일이 없었을 때 등)에도
+            # 무한히 쌓이지 않도록 _recent와 같은 방식으로 크기를 제한 —
+            # TTL 1초가 지난 항목은 어차피 무시되므로 지워도 안전함
+            self._echo[filename] = now
+            if len(self._echo) > 4096:
+                self._echo.popitem(last=False)
+        self._queue.put(target_file)
+
+    def initial_reconcile(self):
+        """감시 시작 전 일회 정합화 — 모니터가 꺼져 있는 동안 놓친 삭제를 반영
+
+        기준 디렉토리를 scandir 한 번으로 읽고, 이미 구축된 대상 인덱스에서
+        기준에 없는 파일들을 바로 지움 (디렉토리당 getdents 한 번이면 충분)
+        """
+        if self._dry_run:
+            print("🧪 dry-run — 시작 정합화 생략")
+            return
+        with os.scandir(self.source_dir) as it:
+            src_names = {e.name for e in it if e.is_file(follow_symlinks=False)}
+        removed = 0
+        for name, path in list(self._index.items()):
+            if name not in src_names:
+                try:
+                    if self._tgt_fd is not None:
+                        os.unlink(path, dir_fd=self._tgt_fd)
+                    else:
+                        os.unlink(path)
+                except OSError as e:
+                    log.error("❌ 정합화 삭제 실패: %s - %s", os.fsdecode(path), e)
+                    continue
+                del self._index[name]
+                removed += 1
+        if removed:
+            print(f"🧹 시작 정합화: 기준에 없는 {removed}개 파일 삭제")
+
+    def _path_value(self, path):
+        """인덱스/큐에 보관할 bytes 값 — dir_fd 모드면 basename만"""
+        if self._tgt_fd is not None:
+            return os.fsencode(os.path.basename(path))
+        return os.fsencode(path)
+
+    def _report_rate(self):
+        """dry-run용 5초 주기 이벤트 처리량 출력 (데몬 스레드)"""
+        prev = 0
+        while True:
+            time.sleep(5)
+            count = self._event_count
+            print(f"🧪 이벤트 {count - prev}개/5초 (누적 {count}개)")
+            prev = count
+
+    def _unlink_one(self, target_file):
+        """파일 하나 unlink (풀 스레드에서 실행) — (경로, 예외 또는 None) 반환"""
+        if self._dry_run:
+            return target_file, None
+        try:
+            if self._tgt_fd is not None:
+                # unlinkat: 경로 해석이 디렉토리 fd + 파일명 한 단계로 끝남
+                os.unlink(target_file, dir_fd=self._tgt_fd)
+            else:
+                os.unlink(target_file)
+            return target_file, None
+        except OSError as e:
+            return target_file, e
+
+    def _drain(self):
+        """큐에 쌓인 삭제를 짧은 디바운스로 모아 일괄 처리 (데몬 스레드)"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + 0.05
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            deleted = 0
+            failed = 0
+            debug_enabled = log.isEnabledFor(logging.DEBUG)
+            # 라인당 로그 레코드 대신 배치당 하나로 모아 콘솔 write를 한 번으로
+            failed_msgs = []
+            miss_msgs = []
+            for target_file, error in self._pool.map(self._unlink_one, batch):
+                if error is None:
+                    deleted += 1
+                elif isinstance(error, FileNotFoundError):
+                    # 대상이 애초에 없었거나 이미 사라진 경우 — unlink 한 번으로
+                    # 판별과 삭제를 겸했으므로 추가 시스템콜 없음
+                    if debug_enabled:
+                        miss_msgs.append(
+                            f"⚠ 대상 파일 없음: {os.fsdecode(target_file)}")
+                else:
+                    failed += 1
+                    failed_msgs.append(
+                        f"❌ 삭제 실패: {os.fsdecode(target_file)} - {error}")
+
+            if miss_msgs:
+                log.debug("%s", "\n".join(miss_msgs))
+            if failed_msgs:
+                log.error("%s", "\n".join(failed_msgs))
+
+            if len(batch) == 1 and deleted:
+                log.info("✓ 동기화 삭제: %s", os.fsdecode(batch[0]))
+            elif deleted or failed:
+                log.info("✓ 동기화 삭제: %d개%s", deleted,
+                         f", 실패 {failed}개" if failed else "")
+
+class _TargetIndexHandler(FileSystemEventHandler):
+    """대상 디렉토리의 변화를 따라가며 파일명 인덱스를 갱신"""
+
+    def __init__(self, index, to_value=os.fsencode):
+        self._index = index
+        self._to_value = to_value
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._index[event.src_path.rpartition(os.sep)[2]] = \
+                self._to_value(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._index.pop(event.src_path.rpartition(os.sep)[2], None)
+            self._index[event.dest_path.rpartition(os.sep)[2]] = \
+                self._to_value(event.dest_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self._index.pop(event.src_path.rpartition(os.sep)[2], None)
+
+def _run_inotify_loop(event_handler, source_dir, target_dir):
+    """watchdog 없이 inotify를 직접 읽는 메인 루프 (리눅스 단방향 전용)
+
+    기준 디렉토리의 삭제와 대상 디렉토리의 인덱스 갱신을
+    inotify 인스턴스 하나로 처리함
+    """
+    flags = inotify_simple.flags
+    inot = inotify_simple.INotify()
+    wd_src = inot.add_watch(source_dir, flags.DELETE | flags.MOVED_FROM)
+    inot.add_watch(target_dir,
+                   flags.CREATE | flags.MOVED_TO | flags.DELETE | flags.MOVED_FROM)
+
+    index = event_handler._index
+    target_prefix = event_handler._target_prefix
+    path_value = event_handler._path_value
+
+    print(f"\n📁 디렉토리 모니터링 시작... (inotify 직접 사용)")
+    print(f"Ctrl+C로 종료하세요.")
+
+    try:
+        while True:
+            for ev in inot.read():
+                if ev.mask & flags.ISDIR or not ev.name:
+                    continue
+                if ev.wd == wd_src:
+                    event_handler.handle_deleted_name(ev.name)
+                elif ev.mask & (flags.CREATE | flags.MOVED_TO):
+                    index[ev.name] = path_value(target_prefix + ev.name)
+                else:
+                    index.pop(ev.name, None)
+    except KeyboardInterrupt:
+        print("\n모니터링 종료")
+
+def monitor_directory(source_dir, target_dir, bidirectional=False):
+    """디렉토리 모니터링 시작
+
+    bidirectional=True이면 observer 하나에 양방향 핸들러를 함께 걸어
+    두 프로세스를 띄우지 않고도 A↔B 동기화 삭제를 수행
+    """
+    event_handler = SyncDeleteHandler(
+        source_dir, target_dir,
+        echo=collections.OrderedDict() if bidirectional else None)
+
+    # inotify_simple이 있으면(리눅스 로컬 FS, 단방향) watchdog을 거치지 않고
+    # 커널 이벤트를 직접 소비 — 이벤트당 파이썬 객체 생성이 거의 없음
+    if (inotify_simple is not None and not bidirectional
+            and not _is_remote_filesystem(source_dir)):
+        event_handler.initial_reconcile()
+        _run_inotify_loop(event_handler, source_dir, target_dir)
+        return
+
+    observer = _make_observer(source_dir)
     observer.schedule(event_handler, source_dir, recursive=False)
+    # 대상 디렉토리도 같은 observer로 감시해 인덱스를 최신으로 유지
+    observer.schedule(_TargetIndexHandler(event_handler._index,
+                                          event_handler._path_value),
+                      target_dir, recursive=False)
+
+    if bidirectional:
+        # 반대 방향 핸들러는 echo 기록을 공유해 핑퐁 삭제를 차단
+        reverse_handler = SyncDeleteHandler(target_dir, source_dir,
+                                            echo=event_handler._echo)
+        observer.schedule(reverse_handler, target_dir, recursive=False)
+        observer.schedule(_TargetIndexHandler(reverse_handler._index,
+                                              reverse_handler._path_value),
+                          source_dir, recursive=False)
+
+    # 모니터가 내려가 있던 동안(또는 이벤트 큐 오버플로로) 놓친 삭제를
+    # 감시 시작 전에 한 번 정리해 두 디렉토리를 일치 상태에서 출발시킴
+    event_handler.initial_reconcile()
+    if bidirectional:
+        reverse_handler.initial_reconcile()
     
     observer.start()
     print(f"\n📁 디렉토리 모니터링 시작...")
     print(f"Ctrl+C로 종료하세요.")
     
     try:
-        while True:
-            time.sleep(1)
+        # join은 조건 변수에서 대기하므로 1초 폴링과 달리 유휴 중에는
+        # 깨어나지 않음 (SIGINT는 메인 스레드에서 그대로 인터럽트됨)
+        while observer.is_alive():
+            observer.join()
     except KeyboardInterrupt:
         observer.stop()
         print("\n모니터링 종료")
-    
+
     observer.join()
 
 if __name__ == "__main__":